@@ -4,44 +4,82 @@ Handles environment variables and provides configuration utilities.
 """
 
 import os
-from dotenv import load_dotenv
+import functools
+from dataclasses import dataclass, field
 from typing import Optional
 
-# Load environment variables from .env file
-load_dotenv()
+# Resolve $HOME once per process
+_HOME = os.path.expanduser("~")
 
 
+@functools.lru_cache(maxsize=1)
+def _ensure_loaded():
+    """Load environment variables from .env file, once and only when needed."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+@functools.lru_cache(maxsize=None)
+def _env(key: str, default: Optional[str] = None) -> Optional[str]:
+    """Read an environment variable once and memoize the result."""
+    _ensure_loaded()
+    return os.environ.get(key, default)
+
+
+def get_cache_dir() -> str:
+    """Get the directory holding cached repositories and API responses."""
+    # Use environment variable for cache directory (Docker compatibility)
+    return _env('PR_REVIEWER_CACHE_DIR') or os.path.join(_HOME, ".pr_reviewer_cache")
+
+
+def _int_env(key: str, default: Optional[int] = None) -> Optional[int]:
+    """Read an integer environment variable, using ``default`` if it is unset or malformed."""
+    value = _env(key)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Warning: ignoring {key}={value!r}, expected an integer")
+        return default
+
+
+def get_clone_depth() -> Optional[int]:
+    """Get the history depth for new clones, or None for full history."""
+    return _int_env('PR_REVIEWER_CLONE_DEPTH')
+
+
+def get_fetch_ttl() -> int:
+    """Get the seconds during which a cached clone is not re-fetched."""
+    return _int_env('PR_REVIEWER_FETCH_TTL', 60)
+
+
+def _required_env(key: str) -> str:
+    """Get a required environment variable."""
+    value = _env(key)
+    if not value:
+        raise ValueError(f"Required environment variable '{key}' is not set. "
+                       f"Please add it to your .env file.")
+    return value
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration class for the PR Reviewer Helper."""
-    
-    def __init__(self):
-        self.github_token = self._get_required_env('GITHUB_TOKEN')
-        self.github_username = self._get_required_env('GITHUB_USERNAME')
-        self.repository = self._get_required_env('GITHUB_REPOSITORY')
-    
-    def _get_required_env(self, key: str) -> str:
-        """Get a required environment variable."""
-        value = os.getenv(key)
-        if not value:
-            raise ValueError(f"Required environment variable '{key}' is not set. "
-                           f"Please add it to your .env file.")
-        return value
-    
-    def _get_optional_env(self, key: str, default: Optional[str] = None) -> Optional[str]:
-        """Get an optional environment variable."""
-        return os.getenv(key, default)
-    
-    def validate(self) -> bool:
-        """Validate that all required configuration is present."""
-        try:
-            # Test that required values are set
-            _ = self.github_token
-            _ = self.github_username
-            _ = self.repository
-            return True
-        except ValueError:
-            return False
-    
+    """Configuration class for the PR Reviewer Helper.
+
+    Values are resolved and validated exactly once at construction time;
+    a constructed Config is always complete and well-formed.
+    """
+
+    github_token: str = field(default_factory=lambda: _required_env('GITHUB_TOKEN'))
+    github_username: str = field(default_factory=lambda: _required_env('GITHUB_USERNAME'))
+    repository: str = field(default_factory=lambda: _required_env('GITHUB_REPOSITORY'))
+
+    def __post_init__(self):
+        """Reject configurations whose values are present but malformed."""
+        if not self.validate_repository_format():
+            raise ValueError("Repository format in GITHUB_REPOSITORY is invalid. Must be 'owner/repo'")
+
     def validate_repository_format(self) -> bool:
         """Validate repository format."""
         if '/' not in self.repository or self.repository.count('/') != 1:
@@ -50,6 +88,7 @@ class Config:
         return bool(owner and repo)
 
 
+@functools.lru_cache(maxsize=1)
 def get_config() -> Config:
-    """Get the application configuration."""
-    return Config() 
\ No newline at end of file
+    """Get the application configuration, constructed and validated once per process."""
+    return Config()
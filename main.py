@@ -5,17 +5,26 @@ Automates personal code reviews by extracting GitHub PR metadata and generating
 """
 
 import sys
-import argparse
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, List, Optional, TextIO, Tuple
 
-from config import get_config
-from utils.github_api import GitHubAPI
-from utils.git_ops import GitOps
-from utils.file_writer import FileWriter
+from config import Config, get_config
 
 
-def parse_arguments():
-    """Parse command line arguments."""
+# Flags understood by the fast argument parser, mapped to their attribute names
+_BOOL_FLAGS = {
+    '--include-comments': 'include_comments',
+    '--include-review-comments': 'include_review_comments',
+    '--skip-diff': 'skip_diff',
+    '--clean-cache': 'clean_cache',
+}
+
+
+def _parse_arguments_full(argv: List[str]):
+    """Parse command line arguments with argparse (help output and error reporting)."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Generate a comprehensive PR review file for ChatGPT analysis",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -73,7 +82,135 @@ Examples:
         help='Clean the repository cache before running'
     )
     
-    return parser.parse_args()
+    return parser.parse_args(argv)
+
+
+def _parse_arguments_fast(argv: List[str]) -> Optional[SimpleNamespace]:
+    """Parse the common command lines without importing argparse.
+    
+    Returns None for anything it does not fully understand, so the caller
+    can fall back to argparse for help text and error messages.
+    """
+    args = SimpleNamespace(
+        pr_number=None,
+        pr=None,
+        output_dir='./reviews',
+        include_comments=False,
+        include_review_comments=False,
+        skip_diff=False,
+        clean_cache=False,
+    )
+    tokens = iter(argv)
+    try:
+        for token in tokens:
+            option, has_value, value = token.partition('=')
+            if option in ('--pr', '--output-dir'):
+                if not has_value:
+                    value = next(tokens)
+                    if value.startswith('-'):
+                        return None
+                if option == '--pr':
+                    args.pr = int(value)
+                else:
+                    args.output_dir = value
+            elif token in _BOOL_FLAGS:
+                setattr(args, _BOOL_FLAGS[token], True)
+            elif not token.startswith('-') and args.pr_number is None:
+                args.pr_number = int(token)
+            else:
+                return None
+    except (StopIteration, ValueError):
+        return None
+    return args
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    argv = sys.argv[1:]
+    args = _parse_arguments_fast(argv)
+    if args is None:
+        args = _parse_arguments_full(argv)
+    return args
+
+
+def prepare_diff(config: Config, base_branch: str, pr_number: int,
+                 clean_cache: bool = False) -> Tuple[str, str, Optional[Callable[[TextIO], Any]]]:
+    """Update the cached repository and collect diff data for a PR.
+    
+    The head is fetched through GitHub's pull request ref, which also
+    covers PRs from forks and merged PRs whose branch has been deleted.
+    
+    Returns ``(diff_stats, commit_history, diff_writer)`` where
+    ``diff_writer`` streams the diff body into an open file.
+    """
+    from utils.git_ops import GitOps
+    
+    diff_writer = None
+    diff_stats = ""
+    commit_history = ""
+    
+    print("Setting up repository for diff generation...")
+    # Pass GitHub token to GitOps for authenticated access
+    git_ops = GitOps(github_token=config.github_token)
+    
+    # Clean cache if requested
+    if clean_cache:
+        print("Cleaning repository cache...")
+        git_ops.cleanup_cache()
+    
+    # Clone or update repository
+    repo_url = f"https://github.com/{config.repository}.git"
+    repo_path = git_ops.clone_or_update_repository(
+        repo_url,
+        config.repository,
+        base_branch
+    )
+    
+    # Stored under its own name, as a fork's branch name may collide with one in the base repository
+    head_branch = f"pr/{pr_number}"
+    
+    # Fetch both branches once; the diff and log calls below only read refs
+    if not git_ops.prepare_refs(repo_path, base_branch, head_branch, pr_number):
+        print("Continuing without diff content...")
+        return diff_stats, commit_history, diff_writer
+    
+    try:
+        # Get diff statistics
+        diff_stats = git_ops.get_diff_stat(repo_path, base_branch, head_branch)
+        
+        # Stream the diff body straight into the review file; this runs later, inside
+        # write_review_file, so stream_diff reports its own failures in the file
+        diff_writer = lambda f: git_ops.stream_diff(repo_path, base_branch, head_branch, f)
+        
+        # Get commit history
+        commit_history = git_ops.get_commit_history(repo_path, base_branch, head_branch)
+        
+    except Exception as e:
+        print(f"Error generating diff: {e}")
+        print("Continuing without diff content...")
+    
+    return diff_stats, commit_history, diff_writer
+
+
+def fetch_comments(github_api, pr, include_comments: bool,
+                   include_review_comments: bool) -> Tuple[Optional[list], Optional[list]]:
+    """Fetch the requested comment listings one after the other.
+    
+    A PyGithub client shares one connection between threads, so its
+    listings must not overlap each other; they may overlap the git work.
+    Returns ``(comments, review_comments)``, None for any not requested.
+    """
+    comments = None
+    if include_comments:
+        print("Fetching PR comments...")
+        comments = github_api.get_pr_comments(pr)
+    
+    review_comments = None
+    if include_review_comments:
+        print("Fetching review comments...")
+        review_comments = github_api.get_review_comments(pr)
+    
+    return comments, review_comments
 
 
 def main():
@@ -89,19 +226,15 @@ def main():
         print("  python main.py --pr 123")
         sys.exit(1)
     
+    # Heavy modules are imported only once we know there is work to do
+    from utils.github_api import GitHubAPI, PRFetchError
+    from utils.file_writer import FileWriter
+    
     try:
         # Load configuration
         print("Loading configuration...")
         config = get_config()
         
-        if not config.validate():
-            print("Error: Invalid configuration. Please check your .env file.")
-            sys.exit(1)
-        
-        if not config.validate_repository_format():
-            print("Error: Repository format in GITHUB_REPOSITORY is invalid. Must be 'owner/repo'")
-            sys.exit(1)
-        
         # Initialize GitHub API
         print("Initializing GitHub API...")
         github_api = GitHubAPI(config.github_token)
@@ -112,8 +245,12 @@ def main():
         
         # Get PR data
         print(f"Fetching PR #{pr_number} from {config.repository}...")
-        pr = github_api.get_pull_request(config.repository, pr_number)
-        metadata = github_api.extract_pr_metadata(pr)
+        metadata = github_api.fetch_pr_metadata_graphql(config.repository, pr_number)
+        
+        # The REST object is only needed to page through comments
+        pr = None
+        if args.include_comments or args.include_review_comments:
+            pr = github_api.get_pull_request(config.repository, pr_number)
         
         print(f"PR Title: {metadata['title']}")
         print(f"Author: {metadata['author_name']}")
@@ -122,61 +259,36 @@ def main():
         # Initialize file writer
         file_writer = FileWriter(args.output_dir)
         
-        # Get comments if requested
-        comments = None
-        if args.include_comments:
-            print("Fetching PR comments...")
-            comments = github_api.get_pr_comments(pr)
-        
-        review_comments = None
-        if args.include_review_comments:
-            print("Fetching review comments...")
-            review_comments = github_api.get_review_comments(pr)
-        
-        # Generate diff if not skipped
-        diff_content = ""
-        diff_stats = ""
-        commit_history = ""
-        
-        if not args.skip_diff:
-            print("Setting up repository for diff generation...")
-            # Pass GitHub token to GitOps for authenticated access
-            git_ops = GitOps(github_token=config.github_token)
-            
-            # Clean cache if requested
-            if args.clean_cache:
-                print("Cleaning repository cache...")
-                git_ops.cleanup_cache()
-            
-            # Clone or update repository
-            repo_url = f"https://github.com/{config.repository}.git"
-            repo_path = git_ops.clone_or_update_repository(repo_url, config.repository)
-            
-            try:
-                # Get diff content
-                diff_content = git_ops.get_diff(
-                    repo_path, 
-                    metadata['base_branch'], 
-                    metadata['head_branch']
-                )
-                
-                # Get diff statistics
-                diff_stats = git_ops.get_diff_stat(
-                    repo_path, 
-                    metadata['base_branch'], 
-                    metadata['head_branch']
+        # Fetch comments and prepare the diff concurrently; these are independent
+        # network/subprocess-bound steps once the PR metadata is known
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            comments_future = None
+            if args.include_comments or args.include_review_comments:
+                comments_future = executor.submit(
+                    fetch_comments,
+                    github_api,
+                    pr,
+                    args.include_comments,
+                    args.include_review_comments
                 )
-                
-                # Get commit history
-                commit_history = git_ops.get_commit_history(
-                    repo_path, 
-                    metadata['base_branch'], 
-                    metadata['head_branch']
+            
+            # Generate diff if not skipped
+            diff_future = None
+            if not args.skip_diff:
+                diff_future = executor.submit(
+                    prepare_diff,
+                    config,
+                    metadata['base_branch'],
+                    pr_number,
+                    args.clean_cache
                 )
-                
-            except Exception as e:
-                print(f"Error generating diff: {e}")
-                print("Continuing without diff content...")
+            
+            comments, review_comments = (
+                comments_future.result() if comments_future else (None, None)
+            )
+            diff_stats, commit_history, diff_writer = (
+                diff_future.result() if diff_future else ("", "", None)
+            )
         
         # Write review file
         print("Writing review file...")
@@ -184,11 +296,11 @@ def main():
             repo_name=config.repository,
             pr_number=pr_number,
             metadata=metadata,
-            diff_content=diff_content,
             diff_stats=diff_stats,
             comments=comments,
             review_comments=review_comments,
-            commit_history=commit_history
+            commit_history=commit_history,
+            diff_writer=diff_writer
         )
         
         if output_file:
@@ -204,6 +316,9 @@ def main():
     except KeyboardInterrupt:
         print("\n\nOperation cancelled by user.")
         sys.exit(1)
+    except PRFetchError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
     except Exception as e:
         print(f"\n❌ Error: {e}")
         sys.exit(1)
@@ -14,7 +14,11 @@ def test_imports():
     required_packages = [
         'github',
         'dotenv',
-        'click'
+        'click',
+        'httpx',
+        'h2',
+        'requests_cache',
+        'orjson'
     ]
     
     for package in required_packages:
@@ -34,6 +38,7 @@ def test_local_imports():
     local_modules = [
         'config',
         'utils.github_api',
+        'utils.github_api_async',
         'utils.git_ops',
         'utils.file_writer'
     ]
@@ -3,9 +3,79 @@ File writer utilities for formatting and outputting PR review data.
 Handles formatting for ChatGPT readability.
 """
 
+import io
 import os
-from datetime import datetime
-from typing import Dict, Any, List
+from collections import ChainMap
+from typing import Dict, Any, Callable, List, Optional, TextIO
+
+# Section banners and timestamp format, built once at import time
+_EQ80 = "=" * 80 + "\n"
+_DASH40 = "-" * 40 + "\n"
+_TS_FMT = "%Y%m%d_%H%M%S"
+
+# Units for human-readable file sizes, in steps of 1024
+_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Metadata section layout; derived fields are supplied by format_metadata_section
+_METADATA_TEMPLATE = (
+    _EQ80 +
+    "PULL REQUEST METADATA\n" +
+    _EQ80 +
+    "\n"
+    # Basic information
+    "PR #{number}: {title}\n"
+    "Author: {author_name} (@{author})\n"
+    "State: {state_upper}\n"
+    "URL: {url}\n\n"
+    # Branch information
+    "Base Branch: {base_branch}\n"
+    "Head Branch: {head_branch}\n"
+    "Base SHA: {base_sha_short}\n"
+    "Head SHA: {head_sha_short}\n\n"
+    # Statistics
+    "Changes: +{additions} -{deletions} lines\n"
+    "Files Changed: {changed_files}\n"
+    "Commits: {commits_count}\n"
+    "Comments: {comments_count}\n"
+    "Review Comments: {review_comments_count}\n\n"
+    # Labels and assignees
+    "{labels_line}{assignees_line}{reviewers_line}\n"
+    # Timestamps
+    "Created: {created_at}\n"
+    "Updated: {updated_at}\n\n"
+    # Description
+    "DESCRIPTION:\n" +
+    _DASH40 +
+    "{description}\n\n"
+)
+
+# Write buffer size for review files; amortizes syscalls on large diffs
+_WRITE_BUFFER = 1 << 20
+
+
+def _list_line(label: str, values: List[str]) -> str:
+    """Render a comma-separated metadata line, or nothing for an empty list."""
+    if not values:
+        return ""
+    return f"{label}: {', '.join(values)}\n"
+
+
+def _comment_rows(comments: List[Any]) -> List[Dict[str, Any]]:
+    """Read the fields used in the comment sections into plain dicts.
+    
+    Each attribute is dereferenced once per comment, up front, so the
+    formatting loops work on plain data rather than PyGithub objects.
+    """
+    return [
+        {
+            'login': comment.user.login,
+            'posted': comment.created_at.isoformat(),
+            'body': comment.body,
+            'path': getattr(comment, 'path', None),
+            'line': getattr(comment, 'line', None),
+        }
+        for comment in comments
+    ]
 
 
 class FileWriter:
@@ -16,115 +86,118 @@ class FileWriter:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
-    def format_metadata_section(self, metadata: Dict[str, Any]) -> str:
-        """Format PR metadata into a readable section."""
-        section = "=" * 80 + "\n"
-        section += "PULL REQUEST METADATA\n"
-        section += "=" * 80 + "\n\n"
+    def _write_metadata_section(self, f: TextIO, metadata: Dict[str, Any]) -> None:
+        """Write PR metadata as a readable section."""
+        f.write(self.format_metadata_section(metadata))
+    
+    def _write_diff_section(self, f: TextIO, diff_content: str, diff_stats: str = "",
+                            diff_writer: Optional[Callable[[TextIO], Any]] = None) -> None:
+        """Write diff content as a readable section.
         
-        # Basic information
-        section += f"PR #{metadata['number']}: {metadata['title']}\n"
-        section += f"Author: {metadata['author_name']} (@{metadata['author']})\n"
-        section += f"State: {metadata['state'].upper()}\n"
-        section += f"URL: {metadata['url']}\n\n"
+        If ``diff_writer`` is given it is called with the file handle to
+        produce the diff body in place of ``diff_content``.
+        """
+        f.write(_EQ80)
+        f.write("CODE CHANGES\n")
+        f.write(_EQ80)
+        f.write("\n")
         
-        # Branch information
-        section += f"Base Branch: {metadata['base_branch']}\n"
-        section += f"Head Branch: {metadata['head_branch']}\n"
-        section += f"Base SHA: {metadata['base_sha'][:8]}\n"
-        section += f"Head SHA: {metadata['head_sha'][:8]}\n\n"
+        if diff_stats:
+            f.write("CHANGE SUMMARY:\n")
+            f.write(_DASH40)
+            f.write(diff_stats)
+            f.write("\n\n")
+        
+        f.write("DETAILED DIFF:\n")
+        f.write(_DASH40)
+        # Write the diff on its own to avoid copying a potentially huge string
+        if diff_writer is not None:
+            diff_writer(f)
+        else:
+            f.write(diff_content)
+        f.write("\n\n")
+    
+    def _write_comments_section(self, f: TextIO, comments: List[Any]) -> None:
+        """Write PR comments as a readable section."""
+        if not comments:
+            return
         
-        # Statistics
-        section += f"Changes: +{metadata['additions']} -{metadata['deletions']} lines\n"
-        section += f"Files Changed: {metadata['changed_files']}\n"
-        section += f"Commits: {metadata['commits_count']}\n"
-        section += f"Comments: {metadata['comments_count']}\n"
-        section += f"Review Comments: {metadata['review_comments_count']}\n\n"
+        f.write(_EQ80)
+        f.write("COMMENTS\n")
+        f.write(_EQ80)
+        f.write("\n")
         
-        # Labels and assignees
-        if metadata['labels']:
-            section += f"Labels: {', '.join(metadata['labels'])}\n"
-        if metadata['assignees']:
-            section += f"Assignees: {', '.join(metadata['assignees'])}\n"
-        if metadata['reviewers']:
-            section += f"Reviewers: {', '.join(metadata['reviewers'])}\n"
-        section += "\n"
+        for i, row in enumerate(_comment_rows(comments), 1):
+            f.write(f"Comment #{i} by @{row['login']}:\n")
+            f.write(f"Posted: {row['posted']}\n")
+            f.write(_DASH40)
+            f.write(row['body'] + "\n\n")
+    
+    def _write_review_comments_section(self, f: TextIO, review_comments: List[Any]) -> None:
+        """Write review comments as a readable section."""
+        if not review_comments:
+            return
         
-        # Timestamps
-        section += f"Created: {metadata['created_at']}\n"
-        section += f"Updated: {metadata['updated_at']}\n\n"
+        f.write(_EQ80)
+        f.write("REVIEW COMMENTS\n")
+        f.write(_EQ80)
+        f.write("\n")
         
-        # Description
-        section += "DESCRIPTION:\n"
-        section += "-" * 40 + "\n"
-        section += metadata['description'] + "\n\n"
+        for i, row in enumerate(_comment_rows(review_comments), 1):
+            f.write(f"Review Comment #{i} by @{row['login']}:\n")
+            f.write(f"File: {row['path']}\n")
+            f.write(f"Line: {row['line']}\n")
+            f.write(f"Posted: {row['posted']}\n")
+            f.write(_DASH40)
+            f.write(row['body'] + "\n\n")
+    
+    def _write_commit_history_section(self, f: TextIO, commit_history: str) -> None:
+        """Write commit history as a readable section."""
+        if not commit_history:
+            return
         
-        return section
+        f.write(_EQ80)
+        f.write("COMMIT HISTORY\n")
+        f.write(_EQ80)
+        f.write("\n")
+        f.write(commit_history)
+        f.write("\n\n")
+    
+    def format_metadata_section(self, metadata: Dict[str, Any]) -> str:
+        """Format PR metadata into a readable section."""
+        derived = {
+            'state_upper': metadata['state'].upper(),
+            'base_sha_short': metadata['base_sha'][:8],
+            'head_sha_short': metadata['head_sha'][:8],
+            'labels_line': _list_line("Labels", metadata['labels']),
+            'assignees_line': _list_line("Assignees", metadata['assignees']),
+            'reviewers_line': _list_line("Reviewers", metadata['reviewers']),
+        }
+        return _METADATA_TEMPLATE.format_map(ChainMap(derived, metadata))
     
     def format_diff_section(self, diff_content: str, diff_stats: str = "") -> str:
         """Format diff content into a readable section."""
-        section = "=" * 80 + "\n"
-        section += "CODE CHANGES\n"
-        section += "=" * 80 + "\n\n"
-        
-        if diff_stats:
-            section += "CHANGE SUMMARY:\n"
-            section += "-" * 40 + "\n"
-            section += diff_stats + "\n\n"
-        
-        section += "DETAILED DIFF:\n"
-        section += "-" * 40 + "\n"
-        section += diff_content + "\n\n"
-        
-        return section
+        buf = io.StringIO()
+        self._write_diff_section(buf, diff_content, diff_stats)
+        return buf.getvalue()
     
     def format_comments_section(self, comments: List[Any]) -> str:
         """Format PR comments into a readable section."""
-        if not comments:
-            return ""
-        
-        section = "=" * 80 + "\n"
-        section += "COMMENTS\n"
-        section += "=" * 80 + "\n\n"
-        
-        for i, comment in enumerate(comments, 1):
-            section += f"Comment #{i} by @{comment.user.login}:\n"
-            section += f"Posted: {comment.created_at.isoformat()}\n"
-            section += "-" * 40 + "\n"
-            section += comment.body + "\n\n"
-        
-        return section
+        buf = io.StringIO()
+        self._write_comments_section(buf, comments)
+        return buf.getvalue()
     
     def format_review_comments_section(self, review_comments: List[Any]) -> str:
         """Format review comments into a readable section."""
-        if not review_comments:
-            return ""
-        
-        section = "=" * 80 + "\n"
-        section += "REVIEW COMMENTS\n"
-        section += "=" * 80 + "\n\n"
-        
-        for i, comment in enumerate(review_comments, 1):
-            section += f"Review Comment #{i} by @{comment.user.login}:\n"
-            section += f"File: {comment.path}\n"
-            section += f"Line: {comment.line}\n"
-            section += f"Posted: {comment.created_at.isoformat()}\n"
-            section += "-" * 40 + "\n"
-            section += comment.body + "\n\n"
-        
-        return section
+        buf = io.StringIO()
+        self._write_review_comments_section(buf, review_comments)
+        return buf.getvalue()
     
     def format_commit_history_section(self, commit_history: str) -> str:
         """Format commit history into a readable section."""
-        if not commit_history:
-            return ""
-        
-        section = "=" * 80 + "\n"
-        section += "COMMIT HISTORY\n"
-        section += "=" * 80 + "\n\n"
-        section += commit_history + "\n\n"
-        
-        return section
+        buf = io.StringIO()
+        self._write_commit_history_section(buf, commit_history)
+        return buf.getvalue()
     
     def write_review_file(self, 
                          repo_name: str, 
@@ -134,55 +207,61 @@ class FileWriter:
                          diff_stats: str = "",
                          comments: List[Any] = None,
                          review_comments: List[Any] = None,
-                         commit_history: str = "") -> str:
-        """Write complete PR review data to a formatted text file."""
+                         commit_history: str = "",
+                         diff_writer: Optional[Callable[[TextIO], Any]] = None) -> str:
+        """Write complete PR review data to a formatted text file.
+        
+        Sections are streamed straight to the file handle so the full
+        review is never assembled in memory. Pass ``diff_writer`` instead
+        of ``diff_content`` to stream the diff body into the file as well.
+        """
+        from datetime import datetime
         
         # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime(_TS_FMT)
         filename = f"pr_review_{repo_name.replace('/', '_')}_{pr_number}_{timestamp}.txt"
         filepath = os.path.join(self.output_dir, filename)
         
-        # Build content
-        content = ""
-        content += self.format_metadata_section(metadata)
-        
-        if commit_history:
-            content += self.format_commit_history_section(commit_history)
-        
-        if diff_content or diff_stats:
-            content += self.format_diff_section(diff_content, diff_stats)
-        
-        if comments:
-            content += self.format_comments_section(comments)
-        
-        if review_comments:
-            content += self.format_review_comments_section(review_comments)
-        
-        # Add footer
-        content += "=" * 80 + "\n"
-        content += f"Review generated on: {datetime.now().isoformat()}\n"
-        content += f"Repository: {repo_name}\n"
-        content += f"Pull Request: #{pr_number}\n"
-        content += "=" * 80 + "\n"
-        
         # Write to file
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            with open(filepath, 'w', encoding='utf-8', buffering=_WRITE_BUFFER) as f:
+                self._write_metadata_section(f, metadata)
+                
+                if commit_history:
+                    self._write_commit_history_section(f, commit_history)
+                
+                if diff_content or diff_stats or diff_writer is not None:
+                    self._write_diff_section(f, diff_content, diff_stats, diff_writer)
+                
+                if comments:
+                    self._write_comments_section(f, comments)
+                
+                if review_comments:
+                    self._write_review_comments_section(f, review_comments)
+                
+                # Add footer
+                f.write(_EQ80)
+                f.write(f"Review generated on: {datetime.now().isoformat()}\n")
+                f.write(f"Repository: {repo_name}\n")
+                f.write(f"Pull Request: #{pr_number}\n")
+                f.write(_EQ80)
             print(f"Review file written to: {filepath}")
             return filepath
         except Exception as e:
             print(f"Error writing review file: {e}")
+            # Do not leave a half-written review behind
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
             return ""
     
     def get_file_size(self, filepath: str) -> str:
         """Get human-readable file size."""
         try:
-            size = os.path.getsize(filepath)
-            for unit in ['B', 'KB', 'MB', 'GB']:
-                if size < 1024.0:
-                    return f"{size:.1f} {unit}"
-                size /= 1024.0
-            return f"{size:.1f} TB"
+            size = os.stat(filepath).st_size
+            # Each unit step is 2**10, so the bit length picks the unit exactly
+            exp = min(max(size.bit_length() - 1, 0) // 10, len(_UNITS) - 1)
+            return f"{size / (1 << (10 * exp)):.1f} {_UNITS[exp]}"
         except Exception:
-            return "Unknown" 
\ No newline at end of file
+            return "Unknown"
@@ -6,9 +6,39 @@ Handles local git operations and diff formatting.
 import subprocess
 import tempfile
 import os
-from typing import Optional, Tuple
+import codecs
+import functools
+import json
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
 import sys
 
+from config import get_cache_dir, get_clone_depth, get_fetch_ttl
+
+# Read size when streaming git output; bounds peak memory for huge diffs
+_STREAM_CHUNK = 64 * 1024
+
+# Records when each set of refs was last fetched into a cached clone; kept under .git
+_LAST_FETCH_FILE = "pr_reviewer_last_fetch"
+
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_repo_path(cache_dir: str, repo_name: str) -> str:
+    """Build the cache path for a repository."""
+    # Convert repo name to safe directory name
+    safe_name = repo_name.replace('/', '_')
+    return os.path.join(cache_dir, safe_name)
+
+
+@functools.lru_cache(maxsize=256)
+def _auth_url(token: Optional[str], repo_name: str) -> str:
+    """Build the clone URL for a repository, embedding the token if given."""
+    if token:
+        return f"https://{token}@github.com/{repo_name}.git"
+    else:
+        return f"https://github.com/{repo_name}.git"
+
 
 class GitOps:
     """Git operations wrapper for diff generation."""
@@ -17,16 +47,16 @@ class GitOps:
         """Initialize GitOps with optional repository path and GitHub token."""
         self.repo_path = repo_path or os.getcwd()
         self.github_token = github_token
-        # Use environment variable for cache directory (Docker compatibility)
-        self.repo_cache_dir = os.getenv('PR_REVIEWER_CACHE_DIR', 
-                                       os.path.join(os.path.expanduser("~"), ".pr_reviewer_cache"))
+        self.repo_cache_dir = get_cache_dir()
         os.makedirs(self.repo_cache_dir, exist_ok=True)
+        # Optional history depth for new clones (smaller clones, but diffs need the merge base)
+        self.clone_depth = get_clone_depth()
+        # Seconds during which a cached clone is considered fresh and not re-fetched
+        self.fetch_ttl = get_fetch_ttl()
     
     def get_cached_repo_path(self, repo_name: str) -> str:
         """Get the path to a cached repository."""
-        # Convert repo name to safe directory name
-        safe_name = repo_name.replace('/', '_')
-        return os.path.join(self.repo_cache_dir, safe_name)
+        return _cached_repo_path(self.repo_cache_dir, repo_name)
     
     def is_repo_cached(self, repo_name: str) -> bool:
         """Check if a repository is already cached."""
@@ -35,26 +65,31 @@ class GitOps:
     
     def get_authenticated_repo_url(self, repo_name: str) -> str:
         """Get authenticated repository URL using GitHub token."""
-        if self.github_token:
-            return f"https://{self.github_token}@github.com/{repo_name}.git"
-        else:
-            return f"https://github.com/{repo_name}.git"
+        return _auth_url(self.github_token, repo_name)
     
-    def clone_or_update_repository(self, repo_url: str, repo_name: str) -> str:
-        """Clone a repository or update existing one."""
+    def clone_or_update_repository(self, repo_url: str, repo_name: str, branch: Optional[str] = None) -> str:
+        """Clone a repository or update existing one.
+        
+        When cloning, only ``branch`` (if given) is fetched up front.
+        """
         cached_path = self.get_cached_repo_path(repo_name)
         
         if self.is_repo_cached(repo_name):
-            print(f"Repository already cached at {cached_path}, checking for updates...")
+            print(f"Repository already cached at {cached_path}")
             return self.update_cached_repository(cached_path, repo_name)
         else:
             print(f"Cloning repository to {cached_path}...")
             # Use authenticated URL for cloning
             auth_repo_url = self.get_authenticated_repo_url(repo_name)
-            return self.clone_repository_to_path(auth_repo_url, cached_path)
+            return self.clone_repository_to_path(auth_repo_url, cached_path, branch)
     
-    def clone_repository_to_path(self, repo_url: str, target_path: str) -> str:
-        """Clone a repository to a specific path."""
+    def clone_repository_to_path(self, repo_url: str, target_path: str, branch: Optional[str] = None) -> str:
+        """Clone a repository to a specific path.
+        
+        Uses a blobless partial clone: commits and trees are fetched now,
+        file contents are fetched lazily by git when a diff needs them.
+        Nothing is checked out; diffs and logs read only origin/* refs.
+        """
         try:
             # Remove existing directory if it exists
             if os.path.exists(target_path):
@@ -62,8 +97,14 @@ class GitOps:
                 shutil.rmtree(target_path)
             
             # Clone the repository
+            cmd = ["git", "clone", "--filter=blob:none", "--no-tags", "--no-checkout"]
+            if branch:
+                cmd += ["--single-branch", "--branch", branch]
+            if self.clone_depth:
+                cmd += ["--depth", str(self.clone_depth)]
+            cmd += [repo_url, target_path]
             result = subprocess.run(
-                ["git", "clone", repo_url, target_path],
+                cmd,
                 capture_output=True, 
                 text=True, 
                 check=True
@@ -77,72 +118,44 @@ class GitOps:
                 print("This appears to be a private repository. Please ensure your GitHub token has 'repo' permissions.")
             sys.exit(1)
     
-    def update_cached_repository(self, repo_path: str, repo_name: str) -> str:
-        """Update an existing cached repository."""
+    def _read_fetch_times(self, repo_path: str) -> Dict[str, float]:
+        """Read when each set of refspecs was last fetched into a cached clone."""
         try:
-            # Configure git to use token for authentication if available
-            if self.github_token:
-                subprocess.run(
-                    ["git", "config", "credential.helper", "store"],
-                    cwd=repo_path, 
-                    check=True, 
-                    capture_output=True
-                )
-                
-                # Set up credential helper to use token
-                credential_url = f"https://{self.github_token}@github.com"
-                subprocess.run(
-                    ["git", "config", "credential.helper", f"!echo 'username={self.github_token}'; echo 'password={self.github_token}'"],
-                    cwd=repo_path, 
-                    check=True, 
-                    capture_output=True
-                )
-            
-            # Fetch all branches and tags
-            subprocess.run(
-                ["git", "fetch", "--all", "--tags"], 
-                cwd=repo_path, 
-                check=True, 
-                capture_output=True
-            )
-            
-            # Check if we need to update (compare local and remote)
-            result = subprocess.run(
-                ["git", "rev-list", "--count", "HEAD..origin/main"],
-                cwd=repo_path, 
-                capture_output=True, 
-                text=True
-            )
-            
-            if result.returncode == 0 and result.stdout.strip() != "0":
-                print(f"Repository is {result.stdout.strip()} commits behind, updating...")
-                # Reset to match remote
-                subprocess.run(
-                    ["git", "reset", "--hard", "origin/main"], 
-                    cwd=repo_path, 
-                    check=True, 
-                    capture_output=True
-                )
-                
-                # Clean untracked files
-                subprocess.run(
-                    ["git", "clean", "-fd"], 
-                    cwd=repo_path, 
-                    check=True, 
-                    capture_output=True
-                )
-                
-                print(f"Repository updated at {repo_path}")
-            else:
-                print(f"Repository is up to date at {repo_path}")
-            
-            return repo_path
-        except subprocess.CalledProcessError as e:
-            print(f"Error updating repository: {e}")
-            # If update fails, try to re-clone
-            print("Update failed, re-cloning repository...")
-            auth_repo_url = self.get_authenticated_repo_url(repo_name)
-            return self.clone_repository_to_path(auth_repo_url, repo_path)
+            with open(os.path.join(repo_path, ".git", _LAST_FETCH_FILE), encoding='utf-8') as f:
+                fetch_times = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Older versions stored a single timestamp
+        return fetch_times if isinstance(fetch_times, dict) else {}
+    
+    def _fetched_recently(self, repo_path: str, refspecs: List[str]) -> bool:
+        """Check whether these refspecs were fetched within the fetch TTL."""
+        last_fetch = self._read_fetch_times(repo_path).get(" ".join(refspecs))
+        return last_fetch is not None and time.time() - last_fetch < self.fetch_ttl
+    
+    def _record_fetch(self, repo_path: str, refspecs: List[str]):
+        """Stamp a set of refspecs with the current time after a successful fetch."""
+        now = time.time()
+        # Drop expired stamps so the file does not grow with every PR reviewed
+        fetch_times = {
+            key: stamp for key, stamp in self._read_fetch_times(repo_path).items()
+            if now - stamp < self.fetch_ttl
+        }
+        fetch_times[" ".join(refspecs)] = now
+        try:
+            with open(os.path.join(repo_path, ".git", _LAST_FETCH_FILE), 'w', encoding='utf-8') as f:
+                json.dump(fetch_times, f)
+        except OSError as e:
+            print(f"Error recording fetch time: {e}")
+    
+    def update_cached_repository(self, repo_path: str, repo_name: str) -> str:
+        """Reuse an existing cached repository.
+        
+        Nothing is fetched here: the refs a review reads are fetched by
+        prepare_refs, and the working tree is never checked out.
+        """
+        print(f"Using cached repository at {repo_path}")
+        return repo_path
     
     def fetch_and_checkout(self, repo_path: str, branch: str) -> bool:
         """Fetch and checkout a specific branch."""
@@ -164,12 +177,47 @@ class GitOps:
             print(f"Error fetching/checkout branch {branch}: {e}")
             return False
     
+    def prepare_refs(self, repo_path: str, base_branch: str, head_branch: str, 
+                     pr_number: Optional[int] = None) -> bool:
+        """Fetch the base and head branches in a single git invocation.
+        
+        Refs land in refs/remotes/origin/*, which is all the read-only diff
+        and log commands need; no checkout or pull is performed. If
+        ``pr_number`` is given, the head is fetched from GitHub's
+        refs/pull/<pr_number>/head instead, which also covers PRs opened
+        from forks, and stored as origin/<head_branch>.
+        
+        The fetch is skipped if the same refs were fetched less than
+        ``fetch_ttl`` seconds ago (``PR_REVIEWER_FETCH_TTL``, default 60)
+        and are still present.
+        """
+        head_source = f"refs/pull/{pr_number}/head" if pr_number else f"refs/heads/{head_branch}"
+        refspecs = list(dict.fromkeys((
+            f"+refs/heads/{base_branch}:refs/remotes/origin/{base_branch}",
+            f"+{head_source}:refs/remotes/origin/{head_branch}",
+        )))
+        
+        if self._fetched_recently(repo_path, refspecs):
+            present = subprocess.run(
+                ["git", "rev-parse", "--quiet", f"origin/{base_branch}", f"origin/{head_branch}"],
+                cwd=repo_path, capture_output=True
+            )
+            if present.returncode == 0:
+                print(f"Branches were fetched less than {self.fetch_ttl}s ago, skipping fetch")
+                return True
+        
+        try:
+            subprocess.run(["git", "fetch", "--no-tags", "origin", *refspecs], 
+                         cwd=repo_path, check=True, capture_output=True)
+            self._record_fetch(repo_path, refspecs)
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"Error fetching branches {base_branch} and {head_branch}: {e}")
+            return False
+    
     def get_diff(self, repo_path: str, base_branch: str, head_branch: str) -> str:
         """Generate diff between two branches."""
         try:
-            # Ensure we're on the base branch
-            self.fetch_and_checkout(repo_path, base_branch)
-            
             # Generate diff
             cmd = ["git", "diff", f"origin/{base_branch}...origin/{head_branch}"]
             result = subprocess.run(cmd, cwd=repo_path, capture_output=True, text=True, check=True)
@@ -179,12 +227,42 @@ class GitOps:
             print(f"Error generating diff: {e}")
             return ""
     
+    def stream_diff(self, repo_path: str, base_branch: str, head_branch: str, sink: TextIO) -> bool:
+        """Stream the diff between two branches into ``sink`` without buffering it whole.
+        
+        On failure a short placeholder line is written in place of (or after)
+        the diff, so the review file never carries a silently empty section.
+        """
+        cmd = ["git", "diff", f"origin/{base_branch}...origin/{head_branch}"]
+        # stderr goes to a file: an unread pipe could fill up and stall git
+        with tempfile.TemporaryFile() as stderr_file:
+            try:
+                proc = subprocess.Popen(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=stderr_file, 
+                                        bufsize=1 << 20)
+            except OSError as e:
+                print(f"Error generating diff: {e}")
+                sink.write("[Diff unavailable: git could not be run]\n")
+                return False
+            
+            # Incremental decoding keeps multi-byte characters split across chunks intact
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            with proc.stdout:
+                for chunk in iter(lambda: proc.stdout.read(_STREAM_CHUNK), b""):
+                    sink.write(decoder.decode(chunk))
+            sink.write(decoder.decode(b"", final=True))
+            
+            if proc.wait() != 0:
+                stderr_file.seek(0)
+                stderr = stderr_file.read().decode('utf-8', errors='replace')
+                print(f"Error generating diff: git exited with status {proc.returncode}")
+                print(f"stderr: {stderr}")
+                sink.write(f"[Diff unavailable: git diff exited with status {proc.returncode}]\n")
+                return False
+        return True
+    
     def get_diff_stat(self, repo_path: str, base_branch: str, head_branch: str) -> str:
         """Generate diff statistics between two branches."""
         try:
-            # Ensure we're on the base branch
-            self.fetch_and_checkout(repo_path, base_branch)
-            
             # Generate diff stats
             cmd = ["git", "diff", "--stat", f"origin/{base_branch}...origin/{head_branch}"]
             result = subprocess.run(cmd, cwd=repo_path, capture_output=True, text=True, check=True)
@@ -197,9 +275,6 @@ class GitOps:
     def get_commit_history(self, repo_path: str, base_branch: str, head_branch: str) -> str:
         """Get commit history between two branches."""
         try:
-            # Ensure we're on the base branch
-            self.fetch_and_checkout(repo_path, base_branch)
-            
             # Get commit history
             cmd = ["git", "log", "--oneline", f"origin/{base_branch}..origin/{head_branch}"]
             result = subprocess.run(cmd, cwd=repo_path, capture_output=True, text=True, check=True)
@@ -212,9 +287,6 @@ class GitOps:
     def get_file_list(self, repo_path: str, base_branch: str, head_branch: str) -> list:
         """Get list of files changed between two branches."""
         try:
-            # Ensure we're on the base branch
-            self.fetch_and_checkout(repo_path, base_branch)
-            
             # Get list of changed files
             cmd = ["git", "diff", "--name-only", f"origin/{base_branch}...origin/{head_branch}"]
             result = subprocess.run(cmd, cwd=repo_path, capture_output=True, text=True, check=True)
@@ -244,10 +316,10 @@ class GitOps:
             print(f"Error cleaning up temporary directory: {e}")
     
     def is_git_repo(self, path: str) -> bool:
-        """Check if a path is a git repository."""
-        try:
-            result = subprocess.run(["git", "rev-parse", "--git-dir"], 
-                                  cwd=path, capture_output=True, text=True)
-            return result.returncode == 0
-        except subprocess.CalledProcessError:
-            return False 
\ No newline at end of file
+        """Check if a path is a git repository.
+        
+        A stat of ``.git`` is enough for the clones this tool manages; it is a
+        directory in a normal checkout and a file in a worktree.
+        """
+        git_entry = os.path.join(path, ".git")
+        return os.path.isdir(git_entry) or os.path.isfile(git_entry) 
\ No newline at end of file
@@ -3,89 +3,471 @@ GitHub API utilities for extracting PR metadata.
 Handles authentication and PR data retrieval.
 """
 
-from github import Github
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+import orjson
+import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from github import Github, GithubException
+from github.AuthenticatedUser import AuthenticatedUser
+from github.GithubRetry import GithubRetry
 from github.PullRequest import PullRequest
-from typing import Dict, Any, Optional
-import sys
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+from config import get_cache_dir
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Connection pool size shared by PyGithub and the direct API session
+POOL_SIZE = 20
+
+# Seconds a fetched PR (in process) or API response (on disk) is reused for
+RESPONSE_CACHE_TTL = 60
+
+# Largest page size the REST API allows; cuts pagination round trips ~3x vs the default 30
+PER_PAGE = 100
+
+# Everything extract_pr_full reports, in a single round trip
+PR_METADATA_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef { name }
+    pullRequest(number: $number) {
+      number
+      title
+      body
+      author { login ... on User { name } }
+      state
+      createdAt
+      updatedAt
+      baseRefName
+      headRefName
+      baseRefOid
+      headRefOid
+      headRepository { nameWithOwner }
+      additions
+      deletions
+      changedFiles
+      labels(first: 50) { nodes { name } }
+      assignees(first: 20) { nodes { login } }
+      reviewRequests(first: 20) { nodes { requestedReviewer { ... on User { login } } } }
+      url
+      mergeable
+      mergeStateStatus
+      isDraft
+      commits { totalCount }
+      comments { totalCount }
+      reviewThreads(first: 100) { nodes { comments { totalCount } } pageInfo { hasNextPage endCursor } }
+    }
+  }
+}
+"""
+
+# Further pages of review threads, for PRs with more than one page of them
+REVIEW_THREADS_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $cursor: String!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      reviewThreads(first: 100, after: $cursor) {
+        nodes { comments { totalCount } }
+        pageInfo { hasNextPage endCursor }
+      }
+    }
+  }
+}
+"""
+
+# GraphQL MergeableState -> REST "mergeable" value
+_MERGEABLE = {'MERGEABLE': True, 'CONFLICTING': False}
+
+
+def _rest_timestamp(value: str) -> str:
+    """Render an API timestamp the way datetime.isoformat() does for UTC."""
+    return value[:-1] + "+00:00" if value.endswith("Z") else value
+
+
+def _orjson_hook(response: requests.Response, *args, **kwargs) -> requests.Response:
+    """Decode the response's JSON body with orjson, several times faster than json on large payloads."""
+    response.json = lambda **_: orjson.loads(response.content)
+    return response
+
+
+def _fetch_list(what: str, fetch: Callable[[], list]) -> list:
+    """Run a list fetch, reporting GitHub and network failures as an empty list.
+    
+    Transient failures are already retried by the client's GithubRetry
+    (5xx responses with backoff, rate limits until they reset), so an
+    error that reaches here is final. Anything else is a bug and propagates.
+    """
+    try:
+        return fetch()
+    except (GithubException, requests.RequestException) as e:
+        print(f"Error fetching {what}: {e}")
+        return []
+
+
+class PRFetchError(Exception):
+    """Raised when a pull request (or a listing of them) cannot be fetched."""
+    
+    def __init__(self, repo_name: str, pr_number: Optional[int], cause: Exception):
+        self.repo_name = repo_name
+        self.pr_number = pr_number
+        self.cause = cause
+        target = f"PR {pr_number}" if pr_number is not None else "PRs"
+        super().__init__(f"Error fetching {target} from {repo_name}: {cause}")
 
 
 class GitHubAPI:
     """GitHub API wrapper for PR metadata extraction."""
     
-    def __init__(self, token: str):
-        """Initialize GitHub API client."""
-        self.github = Github(token)
-        self.user = self.github.get_user()
+    def __init__(self, token: str, cache_dir: Optional[str] = None):
+        """Initialize GitHub API client.
+        
+        API responses are cached for a short time under ``cache_dir``
+        (the repository cache directory by default).
+        """
+        self._token = token
+        self.github = self._build_client(token)
+        self.session = self._build_session(token, cache_dir or get_cache_dir())
+        self._pr_cache: Dict[Tuple[str, int], Tuple[float, PullRequest]] = {}
+    
+    @cached_property
+    def user(self) -> AuthenticatedUser:
+        """Get the authenticated user, created on first use."""
+        return self.github.get_user()
+    
+    @staticmethod
+    def _build_client(token: str) -> Github:
+        """Create a PyGithub client.
+        
+        A client keeps one persistent keep-alive connection that is not safe
+        to use from several threads at once; give each worker its own client.
+        """
+        return Github(
+            token,
+            per_page=PER_PAGE,
+            pool_size=POOL_SIZE,
+            # GithubRetry also retries 403s that are really rate limits
+            retry=GithubRetry(total=5, backoff_factor=1.0, status_forcelist=[502, 503, 504]),
+        )
+    
+    @staticmethod
+    def _build_session(token: str, cache_dir: str) -> requests.Session:
+        """Create a pooled, retrying, caching session for requests made outside PyGithub.
+        
+        Responses are kept in a SQLite cache for RESPONSE_CACHE_TTL seconds,
+        so repeated runs in a dev loop do not re-query the API; validators
+        such as ETag are honoured once an entry goes stale.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        # The token is never part of a cache key, so keep one cache per token
+        token_id = hashlib.sha256(token.encode()).hexdigest()[:16]
+        session = requests_cache.CachedSession(
+            cache_name=os.path.join(cache_dir, f"http_cache_{token_id}"),
+            backend="sqlite",
+            expire_after=RESPONSE_CACHE_TTL,
+            cache_control=True,
+            # GraphQL queries are POSTs; the cache key includes the request body
+            allowable_methods=("GET", "POST"),
+        )
+        session.headers["Authorization"] = f"Bearer {token}"
+        session.hooks["response"].append(_orjson_hook)
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[502, 503, 504],
+            # GraphQL queries are POSTs but read-only, so they are safe to retry
+            allowed_methods=None,
+        )
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry))
+        return session
     
     def get_pull_request(self, repo_name: str, pr_number: int) -> PullRequest:
-        """Get a specific pull request by repository name and PR number."""
+        """Get a specific pull request by repository name and PR number.
+        
+        Results are reused for RESPONSE_CACHE_TTL seconds within the process.
+        Raises PRFetchError if the PR cannot be fetched.
+        """
+        key = (repo_name, pr_number)
+        cached = self._pr_cache.get(key)
+        if cached and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL:
+            return cached[1]
+        
+        try:
+            # A lazy repository skips its own GET; get_pull reports a missing repo too
+            repo = self.github.get_repo(repo_name, lazy=True)
+            pr = repo.get_pull(pr_number)
+        except Exception as e:
+            raise PRFetchError(repo_name, pr_number, e) from e
+        
+        self._pr_cache[key] = (time.monotonic(), pr)
+        return pr
+    
+    def get_pull_requests_bulk(self, repo_name: str, numbers: List[int]) -> Dict[int, PullRequest]:
+        """Get several pull requests, listing them a page at a time.
+        
+        One list request returns up to PER_PAGE pull requests, so a dense set
+        of numbers costs far fewer requests than one GET each. The listing
+        runs from whichever end of the repository's history is nearer the
+        wanted numbers; if even that would cost more pages than there are
+        numbers, each PR is fetched with get_pull_request instead. Numbers
+        that cannot be fetched are left out; PRFetchError is raised only if
+        the listing itself fails.
+        
+        Listed PRs are incomplete: only the fields in the list payload come
+        free. Reading anything else, including ``raw_data`` (and so
+        extract_pr_metadata), costs one GET per PR. Listed PRs are therefore
+        not put in the cache that get_pull_request serves from.
+        """
+        wanted = set(numbers)
+        if not wanted:
+            return {}
+        lowest, highest = min(wanted), max(wanted)
+        
+        found: Dict[int, PullRequest] = {}
         try:
-            repo = self.github.get_repo(repo_name)
-            return repo.get_pull(pr_number)
+            repo = self.github.get_repo(repo_name, lazy=True)
+            newest_first = repo.get_pulls(state="all", sort="created", direction="desc")
+            # The first page is needed anyway; its top entry bounds the listing cost
+            try:
+                newest = newest_first[0].number
+            except IndexError:
+                return found
+            pages_from_newest = (newest - lowest) // PER_PAGE + 1
+            pages_from_oldest = highest // PER_PAGE + 1
+            
+            if min(pages_from_newest, pages_from_oldest) > len(wanted):
+                listing = None
+            elif pages_from_oldest < pages_from_newest:
+                listing = repo.get_pulls(state="all", sort="created", direction="asc")
+                passed = lambda number: number > highest
+            else:
+                listing = newest_first
+                passed = lambda number: number < lowest
+            
+            for pr in listing or ():
+                if pr.number in wanted:
+                    found[pr.number] = pr
+                    if len(found) == len(wanted):
+                        break
+                elif passed(pr.number):
+                    break
         except Exception as e:
-            print(f"Error fetching PR {pr_number} from {repo_name}: {e}")
-            sys.exit(1)
+            raise PRFetchError(repo_name, None, e) from e
+        
+        if listing is None:
+            for number in sorted(wanted):
+                try:
+                    found[number] = self.get_pull_request(repo_name, number)
+                except PRFetchError as e:
+                    print(e)
+        return found
     
-    def extract_pr_metadata(self, pr: PullRequest) -> Dict[str, Any]:
-        """Extract comprehensive metadata from a pull request."""
+    def extract_pr_core(self, pr: PullRequest) -> Dict[str, Any]:
+        """Extract the PR metadata available without any further requests.
+        
+        Fields are read straight from the PR's REST payload rather than
+        through PyGithub's attribute wrappers, which would parse timestamps
+        only to re-serialize them. ``author_name`` is the author's login,
+        since the payload carries no display name.
+        """
+        rd = pr.raw_data
+        user = rd['user'] or {}
+        author_login = user.get('login', 'ghost')
+        base, head = rd['base'], rd['head']
         return {
-            'number': pr.number,
-            'title': pr.title,
-            'description': pr.body or "No description provided",
-            'author': pr.user.login,
-            'author_name': pr.user.name or pr.user.login,
-            'state': pr.state,
-            'created_at': pr.created_at.isoformat(),
-            'updated_at': pr.updated_at.isoformat(),
-            'base_branch': pr.base.ref,
-            'head_branch': pr.head.ref,
-            'base_sha': pr.base.sha,
-            'head_sha': pr.head.sha,
-            'additions': pr.additions,
-            'deletions': pr.deletions,
-            'changed_files': pr.changed_files,
-            'labels': [label.name for label in pr.labels],
-            'assignees': [assignee.login for assignee in pr.assignees],
-            'reviewers': [reviewer.login for reviewer in pr.requested_reviewers],
-            'url': pr.html_url,
-            'mergeable': pr.mergeable,
-            'mergeable_state': pr.mergeable_state,
-            'draft': pr.draft,
-            'commits_count': pr.commits,
-            'comments_count': pr.comments,
-            'review_comments_count': pr.review_comments,
+            'number': rd['number'],
+            'title': rd['title'],
+            'description': rd['body'] or "No description provided",
+            'author': author_login,
+            'author_name': author_login,
+            'state': rd['state'],
+            'created_at': _rest_timestamp(rd['created_at']),
+            'updated_at': _rest_timestamp(rd['updated_at']),
+            'base_branch': base['ref'],
+            'head_branch': head['ref'],
+            'default_branch': base['repo']['default_branch'],
+            'head_repo': head['repo']['full_name'] if head['repo'] else None,
+            'base_sha': base['sha'],
+            'head_sha': head['sha'],
+            'additions': rd['additions'],
+            'deletions': rd['deletions'],
+            'changed_files': rd['changed_files'],
+            'labels': [label['name'] for label in rd['labels']],
+            'assignees': [assignee['login'] for assignee in rd['assignees']],
+            'reviewers': [reviewer['login'] for reviewer in rd['requested_reviewers']],
+            'url': rd['html_url'],
+            'draft': rd['draft'],
+            'commits_count': rd['commits'],
+            'comments_count': rd['comments'],
+            'review_comments_count': rd['review_comments'],
         }
     
-    def get_pr_files(self, pr: PullRequest) -> list:
-        """Get list of files changed in the PR."""
+    def extract_pr_full(self, pr: PullRequest) -> Dict[str, Any]:
+        """Extract the core PR metadata plus the fields that cost extra work.
+        
+        Adds the author's display name (one GET /users/{login} per author)
+        and the mergeability fields, which GitHub may still be computing.
+        """
+        metadata = self.extract_pr_core(pr)
+        rd = pr.raw_data
+        metadata['author_name'] = pr.user.name or metadata['author']
+        metadata['mergeable'] = rd['mergeable']
+        metadata['mergeable_state'] = rd['mergeable_state']
+        return metadata
+    
+    def extract_pr_metadata(self, pr: PullRequest, full: bool = False) -> Dict[str, Any]:
+        """Extract metadata from a pull request, the full set only if ``full``."""
+        return self.extract_pr_full(pr) if full else self.extract_pr_core(pr)
+    
+    def _graphql(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a GraphQL query and return its data, raising on any reported error."""
+        response = self.session.post(GITHUB_GRAPHQL_URL, json={'query': query, 'variables': variables})
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get('errors'):
+            raise RuntimeError("; ".join(error['message'] for error in payload['errors']))
+        return payload['data']
+    
+    def fetch_pr_metadata_graphql(self, repo_name: str, pr_number: int) -> Dict[str, Any]:
+        """Fetch PR metadata with one GraphQL query.
+        
+        PRs with more than 100 review threads take one more query per
+        further 100 threads, so that review_comments_count stays exact.
+        
+        Returns the same dict shape as extract_pr_full without the
+        several REST round trips its lazy attributes trigger. Raises
+        PRFetchError if the PR cannot be fetched.
+        """
+        owner, name = repo_name.split('/')
+        variables = {'owner': owner, 'name': name, 'number': pr_number}
         try:
-            return list(pr.get_files())
+            repo = self._graphql(PR_METADATA_QUERY, variables)['repository']
+            pr = repo['pullRequest']
+            if pr is None:
+                raise RuntimeError("pull request not found")
+            
+            # Review comments are counted per thread; page through all threads
+            threads = pr['reviewThreads']
+            review_comments_count = sum(thread['comments']['totalCount'] for thread in threads['nodes'])
+            while threads['pageInfo']['hasNextPage']:
+                data = self._graphql(REVIEW_THREADS_QUERY, {**variables, 'cursor': threads['pageInfo']['endCursor']})
+                threads = data['repository']['pullRequest']['reviewThreads']
+                review_comments_count += sum(thread['comments']['totalCount'] for thread in threads['nodes'])
         except Exception as e:
-            print(f"Error fetching PR files: {e}")
-            return []
+            raise PRFetchError(repo_name, pr_number, e) from e
+        
+        author = pr['author'] or {}
+        author_login = author.get('login', 'ghost')
+        return {
+            'number': pr['number'],
+            'title': pr['title'],
+            'description': pr['body'] or "No description provided",
+            'author': author_login,
+            'author_name': author.get('name') or author_login,
+            # REST reports merged PRs as closed
+            'state': 'open' if pr['state'] == 'OPEN' else 'closed',
+            'created_at': _rest_timestamp(pr['createdAt']),
+            'updated_at': _rest_timestamp(pr['updatedAt']),
+            'base_branch': pr['baseRefName'],
+            'head_branch': pr['headRefName'],
+            'default_branch': (repo['defaultBranchRef'] or {}).get('name'),
+            'head_repo': (pr['headRepository'] or {}).get('nameWithOwner'),
+            'base_sha': pr['baseRefOid'],
+            'head_sha': pr['headRefOid'],
+            'additions': pr['additions'],
+            'deletions': pr['deletions'],
+            'changed_files': pr['changedFiles'],
+            'labels': [label['name'] for label in pr['labels']['nodes']],
+            'assignees': [assignee['login'] for assignee in pr['assignees']['nodes']],
+            'reviewers': [
+                request['requestedReviewer']['login']
+                for request in pr['reviewRequests']['nodes']
+                if request['requestedReviewer'] and 'login' in request['requestedReviewer']
+            ],
+            'url': pr['url'],
+            'mergeable': _MERGEABLE.get(pr['mergeable']),
+            'mergeable_state': pr['mergeStateStatus'].lower(),
+            'draft': pr['isDraft'],
+            'commits_count': pr['commits']['totalCount'],
+            'comments_count': pr['comments']['totalCount'],
+            'review_comments_count': review_comments_count,
+        }
+    
+    def iter_pr_files(self, pr: PullRequest) -> Iterator[Dict[str, Any]]:
+        """Yield the files changed in the PR as raw REST dicts, page by page.
+        
+        Files are never completed lazily, so ``raw_data`` costs no extra request.
+        """
+        for pr_file in pr.get_files():
+            yield pr_file.raw_data
+    
+    def get_pr_files(self, pr: PullRequest) -> list:
+        """Get list of files changed in the PR, as raw REST dicts."""
+        return _fetch_list("PR files", lambda: list(self.iter_pr_files(pr)))
     
     def get_pr_comments(self, pr: PullRequest) -> list:
         """Get comments on the PR."""
-        try:
-            return list(pr.get_issue_comments())
-        except Exception as e:
-            print(f"Error fetching PR comments: {e}")
-            return []
+        return _fetch_list("PR comments", lambda: list(pr.get_issue_comments()))
     
     def get_review_comments(self, pr: PullRequest) -> list:
         """Get review comments on the PR."""
+        return _fetch_list("review comments", lambda: list(pr.get_review_comments()))
+    
+    def _fetch_listings(self, raw_pr: Dict[str, Any]) -> Tuple[list, list, list]:
+        """Fetch a PR's files, comments and review comments on a client of their own.
+        
+        The listings run one after another and the client is closed afterwards.
+        Returns ``(files, comments, review_comments)``.
+        """
+        client = self._build_client(self._token)
         try:
-            return list(pr.get_review_comments())
-        except Exception as e:
-            print(f"Error fetching review comments: {e}")
-            return []
+            pr = client.create_from_raw_data(PullRequest, raw_pr)
+            return self.get_pr_files(pr), self.get_pr_comments(pr), self.get_review_comments(pr)
+        finally:
+            client.close()
+    
+    def get_pr_details(self, pr: PullRequest, full: bool = False) -> Dict[str, Any]:
+        """Fetch a PR's metadata alongside its files and comments.
+        
+        PyGithub clients are not thread-safe, so the listings run in one
+        worker on a separate client while the metadata is extracted on this
+        one. Returns a dict with the keys ``pr`` (the raw REST payload),
+        ``metadata``, ``files``, ``comments`` and ``review_comments``, the
+        same keys as github_api_async.get_pr_bundle plus ``metadata``.
+        """
+        # Read before any worker starts; an incomplete PR completes itself on this client
+        raw_pr = pr.raw_data
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            metadata_future = executor.submit(self.extract_pr_metadata, pr, full)
+            listings_future = executor.submit(self._fetch_listings, raw_pr)
+            files, comments, review_comments = listings_future.result()
+            metadata = metadata_future.result()
+        return {
+            'pr': raw_pr,
+            'metadata': metadata,
+            'files': files,
+            'comments': comments,
+            'review_comments': review_comments,
+        }
     
     def test_connection(self) -> bool:
-        """Test GitHub API connection."""
+        """Test GitHub API connection.
+        
+        Goes through the caching session, so a repeat check within
+        RESPONSE_CACHE_TTL is free and a later one is an ETag revalidation
+        (a 304 that does not count against the rate limit).
+        """
         try:
-            # Try to get the authenticated user
-            _ = self.github.get_user()
+            response = self.session.get(f"{GITHUB_API_URL}/user")
+            response.raise_for_status()
             return True
         except Exception as e:
             print(f"GitHub API connection failed: {e}")
-            return False 
\ No newline at end of file
+            return False
@@ -0,0 +1,171 @@
+"""
+Asynchronous GitHub API utilities for fetching PR data concurrently.
+Retrieves a PR and its sub-resources in parallel over the REST API.
+"""
+
+import asyncio
+import random
+import time
+from typing import Dict, Any, List, Optional, Union
+
+import httpx
+import orjson
+
+from utils.github_api import PRFetchError
+
+GITHUB_API_URL = "https://api.github.com"
+PER_PAGE = 100
+
+# In-flight request cap; keeps bursts under GitHub's secondary rate limits
+MAX_CONCURRENCY = 6
+
+# Attempts made after a rate-limited response before giving up
+MAX_RETRIES = 3
+
+
+def _build_client(token: str) -> httpx.AsyncClient:
+    """Create an HTTP client authenticated against the GitHub REST API.
+
+    Requests are multiplexed over HTTP/2, so concurrent fetches and page
+    follow-ups share one TLS connection instead of opening one each.
+    """
+    return httpx.AsyncClient(
+        base_url=GITHUB_API_URL,
+        http2=True,
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        timeout=30,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        },
+    )
+
+
+def _last_page(response: httpx.Response) -> int:
+    """Get the last page number advertised by a response's Link header."""
+    last = response.links.get("last")
+    if not last:
+        return 1
+    page = httpx.URL(last["url"]).params.get("page")
+    return int(page) if page else 1
+
+
+def _retry_delay(response: httpx.Response) -> Optional[float]:
+    """Get the seconds to wait before retrying a rate-limited response.
+
+    Returns None when the response is not a rate limit and should not be retried.
+    """
+    if response.status_code not in (403, 429):
+        return None
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        return float(retry_after)
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = float(response.headers.get("X-RateLimit-Reset", 0))
+        return max(reset - time.time(), 0.0)
+    return None
+
+
+async def _get(client: httpx.AsyncClient, sem: asyncio.Semaphore, path: str,
+               params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+    """GET a resource, holding a concurrency slot and backing off on rate limits."""
+    for attempt in range(MAX_RETRIES + 1):
+        async with sem:
+            response = await client.get(path, params=params)
+        delay = _retry_delay(response)
+        if delay is None or attempt == MAX_RETRIES:
+            break
+        # Jitter keeps concurrent requests from retrying in lockstep
+        await asyncio.sleep(delay + random.random())
+    response.raise_for_status()
+    return response
+
+
+async def _get_json(client: httpx.AsyncClient, sem: asyncio.Semaphore, path: str,
+                    params: Optional[Dict[str, Any]] = None) -> Any:
+    """GET a single resource and decode its JSON body."""
+    response = await _get(client, sem, path, params)
+    return orjson.loads(response.content)
+
+
+async def _get_paginated(client: httpx.AsyncClient, sem: asyncio.Semaphore, path: str) -> List[Dict[str, Any]]:
+    """GET every page of a list endpoint.
+
+    The first page reveals the page count; the remaining pages are then
+    requested concurrently rather than by following ``next`` links one by one.
+    """
+    first = await _get(client, sem, path, {"per_page": PER_PAGE})
+    items = orjson.loads(first.content)
+
+    last_page = _last_page(first)
+    if last_page > 1:
+        pages = await asyncio.gather(*(
+            _get_json(client, sem, path, {"per_page": PER_PAGE, "page": page})
+            for page in range(2, last_page + 1)
+        ))
+        for page_items in pages:
+            items.extend(page_items)
+
+    return items
+
+
+async def _fetch_bundle(client: httpx.AsyncClient, sem: asyncio.Semaphore,
+                        repo_name: str, pr_number: int) -> Dict[str, Any]:
+    """Fetch one pull request's bundle over an open client."""
+    try:
+        pr, files, comments, review_comments = await asyncio.gather(
+            _get_json(client, sem, f"/repos/{repo_name}/pulls/{pr_number}"),
+            _get_paginated(client, sem, f"/repos/{repo_name}/pulls/{pr_number}/files"),
+            _get_paginated(client, sem, f"/repos/{repo_name}/issues/{pr_number}/comments"),
+            _get_paginated(client, sem, f"/repos/{repo_name}/pulls/{pr_number}/comments"),
+        )
+    except (httpx.HTTPError, ValueError) as e:
+        raise PRFetchError(repo_name, pr_number, e) from e
+
+    return {
+        'pr': pr,
+        'files': files,
+        'comments': comments,
+        'review_comments': review_comments,
+    }
+
+
+async def fetch_pr_bundle(repo_name: str, pr_number: int, token: str) -> Dict[str, Any]:
+    """Fetch a pull request together with its files and comments concurrently.
+
+    Returns a dict of raw REST payloads with the keys ``pr``, ``files``,
+    ``comments`` (issue comments) and ``review_comments``. At most
+    MAX_CONCURRENCY requests are in flight at once. Raises PRFetchError
+    if any part cannot be fetched.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with _build_client(token) as client:
+        return await _fetch_bundle(client, sem, repo_name, pr_number)
+
+
+async def fetch_pr_bundles(repo_name: str, pr_numbers: List[int],
+                           token: str) -> Dict[int, Union[Dict[str, Any], PRFetchError]]:
+    """Fetch several pull request bundles concurrently over one client.
+
+    A PR that fails does not abort the others: its entry holds the
+    PRFetchError instead of a bundle, and the caller decides what to do.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with _build_client(token) as client:
+        results = await asyncio.gather(
+            *(_fetch_bundle(client, sem, repo_name, number) for number in pr_numbers),
+            return_exceptions=True,
+        )
+    return dict(zip(pr_numbers, results))
+
+
+def get_pr_bundle(repo_name: str, pr_number: int, token: str) -> Dict[str, Any]:
+    """Synchronous wrapper around fetch_pr_bundle for non-async callers."""
+    return asyncio.run(fetch_pr_bundle(repo_name, pr_number, token))
+
+
+def get_pr_bundles(repo_name: str, pr_numbers: List[int],
+                   token: str) -> Dict[int, Union[Dict[str, Any], PRFetchError]]:
+    """Synchronous wrapper around fetch_pr_bundles for non-async callers."""
+    return asyncio.run(fetch_pr_bundles(repo_name, pr_numbers, token))